@@ -1,143 +1,330 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, abort, g
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from flask_compress import Compress
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from sqlalchemy import event
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError, InvalidHashError
 import os
+import re
 import logging
+import orjson
+import click
 
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper())
 logger = logging.getLogger(__name__)
 
+# Single switch for dev-only conveniences; anything else is treated as production
+IS_DEV = os.environ.get('FLASK_ENV') == 'development'
+
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///todo.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = os.urandom(24)  # Required for session management
+# Keep PRAGMA-configured connections pooled and reused across threads
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_pre_ping': False,
+    'connect_args': {'check_same_thread': False},
+}
+app.config['TEMPLATES_AUTO_RELOAD'] = IS_DEV
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500  # leaves the small auth JSON replies uncompressed
+# The todos cache must be shared by all workers, or writes only invalidate
+# the worker that handled them and other workers serve stale lists
+if os.environ.get('CACHE_REDIS_URL'):
+    app.config['CACHE_TYPE'] = 'RedisCache'
+    app.config['CACHE_REDIS_URL'] = os.environ['CACHE_REDIS_URL']
+elif IS_DEV:
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+else:
+    logger.warning("CACHE_REDIS_URL not set; /api/todos caching disabled")
+    app.config['CACHE_TYPE'] = 'NullCache'
+    app.config['CACHE_NO_NULL_WARNING'] = True
+# Stable across restarts and shared by all workers so sessions stay valid
+if 'SECRET_KEY' in os.environ:
+    app.secret_key = os.environ['SECRET_KEY']
+elif IS_DEV:
+    logger.warning("SECRET_KEY not set; using a per-process key, sessions reset on restart")
+    app.secret_key = os.urandom(24)
+else:
+    raise RuntimeError("SECRET_KEY environment variable must be set")
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+app.config['SESSION_REFRESH_EACH_REQUEST'] = False  # don't re-sign the cookie on every request
 db = SQLAlchemy(app)
+cache = Cache(app)
+Compress(app)
+# Deployment settings for the login rate limit, required outside development:
+#   PROXY_FIX_X_FOR        number of proxies in front of gunicorn whose
+#                          X-Forwarded-For is trusted (1 behind a single
+#                          platform router, 0 when clients connect directly;
+#                          too high lets clients spoof their IP per request)
+#   RATELIMIT_STORAGE_URI  storage shared by all workers, e.g. redis://...
+if 'PROXY_FIX_X_FOR' in os.environ:
+    proxy_hops = int(os.environ['PROXY_FIX_X_FOR'])
+elif IS_DEV:
+    proxy_hops = 0
+else:
+    raise RuntimeError("PROXY_FIX_X_FOR environment variable must be set (0 without a proxy)")
+if proxy_hops:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops)
+if 'RATELIMIT_STORAGE_URI' in os.environ:
+    ratelimit_storage = os.environ['RATELIMIT_STORAGE_URI']
+elif IS_DEV:
+    ratelimit_storage = 'memory://'
+else:
+    raise RuntimeError("RATELIMIT_STORAGE_URI environment variable must be set (e.g. redis://...)")
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    storage_uri=ratelimit_storage,
+)
 
-def ensure_db_exists():
-    db_path = 'todo.db'
-    if not os.path.exists(db_path):
-        logger.info("Database file not found. Creating new database...")
-        with app.app_context():
-            db.create_all()
-            logger.info("New database created successfully")
-    else:
-        logger.info("Database file exists")
+if IS_DEV:
+    try:
+        from nplusone.ext.flask_sqlalchemy import NPlusOne
+        NPlusOne(app)
+    except ImportError:
+        logger.info("nplusone not installed; N+1 query detection disabled")
+
+# Argon2id cost parameters; tune so a single verify takes ~50-100ms on the target host
+ph = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', 2)),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 64 * 1024)),
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', 1)),
+)
+# Verified against for unknown emails so every login attempt costs one hash
+DUMMY_HASH = ph.hash("dummy")
+# argon2 releases the GIL, so concurrent logins can hash on separate cores
+HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+def verify_password(password_hash, password):
+    """Return (matches, needs_rehash); runs on HASH_POOL, so no app context."""
+    if not password_hash.startswith('$argon2'):
+        # Legacy Werkzeug hash: upgrade to argon2 once verified
+        matches = check_password_hash(password_hash, password)
+        return matches, matches
+    try:
+        ph.verify(password_hash, password)
+    except (VerifyMismatchError, InvalidHashError):
+        return False, False
+    return True, ph.check_needs_rehash(password_hash)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA journal_size_limit=6144000",
+    "PRAGMA foreign_keys=ON",
+)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Applied to every new DBAPI connection; WAL persists in the file,
+    # the rest are per-connection settings
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+def register_sqlite_pragmas():
+    with app.app_context():
+        if not event.contains(db.engine, "connect", set_sqlite_pragmas):
+            event.listen(db.engine, "connect", set_sqlite_pragmas)
+            # Drop connections opened before the listener was registered
+            db.engine.dispose()
 
 def init_db():
     try:
-        ensure_db_exists()
         with app.app_context():
             # Only create tables if they don't exist
             db.create_all()
+            # create_all skips indexes on tables that already exist
+            for index in Todo.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
             logger.info("Database initialized successfully")
     except Exception as e:
-        logger.error(f"Error initializing database: {str(e)}")
+        logger.error("Error initializing database: %s", e)
         raise
 
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and indexes; run once before starting workers."""
+    init_db()
+    click.echo("Database initialized")
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
-    todos = db.relationship('Todo', backref='user', lazy=True)
+    password_hash = db.Column(db.String(256), nullable=False)
+    # Lazy loads raise instead of silently issuing a query per row;
+    # use selectinload(User.todos) where both are needed
+    todos = db.relationship('Todo', back_populates='user', lazy='raise_on_sql')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = HASH_POOL.submit(ph.hash, password).result()
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        matches, needs_rehash = HASH_POOL.submit(verify_password, self.password_hash, password).result()
+        if needs_rehash:
+            self.set_password(password)
+            db.session.commit()
+        return matches
 
 class Todo(db.Model):
+    # Serves the per-user list query as an index range scan, already sorted
+    __table_args__ = (
+        db.Index('ix_todo_user_created', 'user_id', db.text('created_at DESC')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    completed = db.Column(db.Boolean, default=False)
+    # Stored and returned as 0/1 so reads skip the Boolean type adapter
+    completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User', back_populates='todos', lazy='raise_on_sql')
 
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'completed': self.completed,
-            'created_at': self.created_at.strftime('%Y-%m-%d %I:%M %p')  # Format: 2024-03-14 02:30 PM
+            'created_at': self.created_at  # serialized by orjson as UTC ISO 8601
         }
 
+def ojson(obj, status=200):
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC | orjson.OPT_OMIT_MICROSECONDS),
+        status=status,
+        mimetype='application/json',
+    )
+
+# Cached lists are keyed by a per-user generation that writers bump after
+# commit, so a GET that read rows before the write stores its stale list
+# under a key that is never read again
+def _todos_generation_key(user_id):
+    return f"todos_gen:{user_id}"
+
+def todos_cache_key(user_id):
+    generation = cache.get(_todos_generation_key(user_id)) or 0
+    return f"todos:{user_id}:{generation}"
+
+def invalidate_todos(user_id):
+    key = _todos_generation_key(user_id)
+    if app.config['CACHE_TYPE'] == 'RedisCache':
+        cache.cache.inc(key)  # atomic INCR, never expires
+    else:
+        cache.set(key, (cache.get(key) or 0) + 1, timeout=0)
+
+@lru_cache(maxsize=None)
+def _rendered_page(name):
+    return render_template(name)
+
+def render_page(name):
+    """Serve a template with no per-request data, rendering it only once."""
+    if app.config['TEMPLATES_AUTO_RELOAD']:
+        return render_template(name)
+    return Response(_rendered_page(name), mimetype='text/html')
+
+@app.before_request
+def require_api_auth():
+    # Resolve the session once per request; API handlers read g.user_id
+    if request.path.startswith('/api/'):
+        user_id = session.get('user_id')
+        if user_id is None:
+            return jsonify({'error': 'Not authenticated'}), 401
+        g.user_id = user_id
+
 @app.route('/')
 def index():
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    return render_template('index.html')
+    return render_page('index.html')
+
+EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')  # used with fullmatch()
+
+def _validate_credentials(data, kind):
+    """Return an error message for an invalid login/signup payload, else None."""
+    if not data:
+        logger.error("No data received in %s request", kind)
+        return 'No data received'
+    if not data.get('email'):
+        logger.error("Email missing in %s request", kind)
+        return 'Email is required'
+    if not data.get('password'):
+        logger.error("Password missing in %s request", kind)
+        return 'Password is required'
+    if not isinstance(data['password'], str):
+        logger.error("Invalid password type in %s request", kind)
+        return 'Password must be a string'
+    if not isinstance(data['email'], str) or not EMAIL_RE.fullmatch(data['email']):
+        logger.error("Invalid email format: %s", data['email'])
+        return 'Invalid email format'
+    return None
+
+@app.errorhandler(429)
+def rate_limited(e):
+    return jsonify({'success': False, 'message': 'Too many attempts. Please try again later.'}), 429
 
 @app.route('/login', methods=['GET', 'POST'])
+@limiter.limit("5/minute", methods=['POST'])
 def login():
     if request.method == 'POST':
         try:
             data = request.get_json()
-            logger.debug(f"Login attempt with data: {data}")
+            logger.debug("Login attempt for email: %s", (data or {}).get('email'))
             
             # Validate input data
-            if not data:
-                logger.error("No data received in login request")
-                return jsonify({'success': False, 'message': 'No data received'}), 400
-                
-            if 'email' not in data or not data['email']:
-                logger.error("Email missing in login request")
-                return jsonify({'success': False, 'message': 'Email is required'}), 400
-                
-            if 'password' not in data or not data['password']:
-                logger.error("Password missing in login request")
-                return jsonify({'success': False, 'message': 'Password is required'}), 400
-            
-            # Validate email format
-            if '@' not in data['email'] or '.' not in data['email']:
-                logger.error(f"Invalid email format: {data['email']}")
-                return jsonify({'success': False, 'message': 'Invalid email format'}), 400
+            error = _validate_credentials(data, 'login')
+            if error:
+                return jsonify({'success': False, 'message': error}), 400
             
             # Find user and verify password
             user = User.query.filter_by(email=data['email']).first()
-            if user and user.check_password(data['password']):
+            if user:
+                ok = user.check_password(data['password'])
+            else:
+                HASH_POOL.submit(verify_password, DUMMY_HASH, data['password']).result()
+                ok = False
+            if ok:
                 session['user_id'] = user.id
-                logger.info(f"Successfully logged in user: {data['email']}")
+                logger.info("Successfully logged in user: %s", data['email'])
                 return jsonify({'success': True})
             
-            logger.warning(f"Failed login attempt for email: {data['email']}")
+            logger.warning("Failed login attempt for email: %s", data['email'])
             return jsonify({'success': False, 'message': 'Invalid email or password'}), 401
             
         except Exception as e:
-            logger.error(f"Error during login: {str(e)}")
+            logger.error("Error during login: %s", e)
             return jsonify({'success': False, 'message': 'An error occurred during login'}), 500
-    return render_template('login.html')
+    return render_page('login.html')
 
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         try:
             data = request.get_json()
-            logger.debug(f"Signup attempt with data: {data}")
+            logger.debug("Signup attempt for email: %s", (data or {}).get('email'))
             
             # Validate input data
-            if not data:
-                logger.error("No data received in signup request")
-                return jsonify({'success': False, 'message': 'No data received'}), 400
-                
-            if 'email' not in data or not data['email']:
-                logger.error("Email missing in signup request")
-                return jsonify({'success': False, 'message': 'Email is required'}), 400
-                
-            if 'password' not in data or not data['password']:
-                logger.error("Password missing in signup request")
-                return jsonify({'success': False, 'message': 'Password is required'}), 400
-            
-            # Validate email format
-            if '@' not in data['email'] or '.' not in data['email']:
-                logger.error(f"Invalid email format: {data['email']}")
-                return jsonify({'success': False, 'message': 'Invalid email format'}), 400
+            error = _validate_credentials(data, 'signup')
+            if error:
+                return jsonify({'success': False, 'message': error}), 400
             
             # Check if email already exists
             existing_user = User.query.filter_by(email=data['email']).first()
             if existing_user:
-                logger.warning(f"Email already registered: {data['email']}")
+                logger.warning("Email already registered: %s", data['email'])
                 return jsonify({'success': False, 'message': 'Email already registered'}), 400
             
             # Create new user
@@ -148,17 +335,17 @@ def signup():
                 db.session.add(user)
                 db.session.commit()
                 session['user_id'] = user.id
-                logger.info(f"Successfully created user with email: {data['email']}")
+                logger.info("Successfully created user with email: %s", data['email'])
                 return jsonify({'success': True})
             except Exception as db_error:
                 db.session.rollback()
-                logger.error(f"Database error during signup: {str(db_error)}")
+                logger.error("Database error during signup: %s", db_error)
                 return jsonify({'success': False, 'message': 'Database error occurred'}), 500
                 
         except Exception as e:
-            logger.error(f"Error during signup: {str(e)}")
+            logger.error("Error during signup: %s", e)
             return jsonify({'success': False, 'message': 'An error occurred during signup'}), 500
-    return render_template('signup.html')
+    return render_page('signup.html')
 
 @app.route('/logout')
 def logout():
@@ -166,43 +353,88 @@ def logout():
     return redirect(url_for('login'))
 
 @app.route('/api/todos', methods=['GET'])
+@cache.cached(timeout=60, make_cache_key=lambda: todos_cache_key(g.user_id))
 def get_todos():
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    todos = Todo.query.filter_by(user_id=session['user_id']).order_by(Todo.created_at.desc()).all()
-    return jsonify([todo.to_dict() for todo in todos])
+    # Column tuples rather than ORM instances: rows are serialized and discarded
+    rows = db.session.execute(
+        db.select(Todo.id, Todo.title, Todo.completed, Todo.created_at)
+        .where(Todo.user_id == g.user_id)
+        .order_by(Todo.created_at.desc())
+    ).all()
+    return ojson([
+        {'id': r.id, 'title': r.title, 'completed': r.completed, 'created_at': r.created_at}
+        for r in rows
+    ])
 
 @app.route('/api/todos', methods=['POST'])
 def add_todo():
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
     data = request.get_json()
-    new_todo = Todo(title=data['title'], user_id=session['user_id'])
+    new_todo = Todo(title=data['title'], user_id=g.user_id)
     db.session.add(new_todo)
     db.session.commit()
-    return jsonify(new_todo.to_dict())
+    invalidate_todos(g.user_id)
+    return ojson(new_todo.to_dict())
+
+BULK_MAX_TODOS = 500
+
+@app.route('/api/todos/bulk', methods=['POST'])
+def add_todos_bulk():
+    data = request.get_json()
+    if not isinstance(data, list):
+        return jsonify({'error': 'Expected a list of todos with titles'}), 400
+    # Bounds how long one request can hold the SQLite write lock
+    if len(data) > BULK_MAX_TODOS:
+        return jsonify({'error': f'At most {BULK_MAX_TODOS} todos per request'}), 413
+    max_title = Todo.__table__.c.title.type.length
+    if not all(
+        isinstance(t, dict) and isinstance(t.get('title'), str) and 0 < len(t['title']) <= max_title
+        for t in data
+    ):
+        return jsonify({'error': f'Each todo needs a title of 1-{max_title} characters'}), 400
+    # One transaction (and one fsync) for the whole batch
+    todos = [Todo(title=t['title'], user_id=g.user_id) for t in data]
+    db.session.add_all(todos)
+    db.session.flush()
+    # Serialize before commit expires the instances, which would reload each one
+    payload = [todo.to_dict() for todo in todos]
+    db.session.commit()
+    invalidate_todos(g.user_id)
+    return ojson(payload)
 
 @app.route('/api/todos/<int:todo_id>', methods=['DELETE'])
 def delete_todo(todo_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    todo = Todo.query.filter_by(id=todo_id, user_id=session['user_id']).first_or_404()
-    db.session.delete(todo)
+    row = db.session.execute(
+        db.delete(Todo)
+        .where(Todo.id == todo_id, Todo.user_id == g.user_id)
+        .returning(Todo.id)
+    ).first()
     db.session.commit()
+    if row is None:
+        abort(404)
+    invalidate_todos(g.user_id)
     return '', 204
 
 @app.route('/api/todos/<int:todo_id>', methods=['PUT'])
 def toggle_todo(todo_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
-    todo = Todo.query.filter_by(id=todo_id, user_id=session['user_id']).first_or_404()
-    todo.completed = not todo.completed
+    # Single atomic UPDATE ... RETURNING (SQLite 3.35+) instead of load, flip, flush
+    row = db.session.execute(
+        db.update(Todo)
+        .where(Todo.id == todo_id, Todo.user_id == g.user_id)
+        .values(completed=db.not_(Todo.completed))
+        .returning(Todo.id, Todo.title, Todo.completed, Todo.created_at)
+    ).first()
     db.session.commit()
-    return jsonify(todo.to_dict())
+    if row is None:
+        abort(404)
+    invalidate_todos(g.user_id)
+    return ojson({'id': row.id, 'title': row.title, 'completed': row.completed, 'created_at': row.created_at})
+
+# Per-worker engine setup only; the schema is created once by 'flask init-db'
+register_sqlite_pragmas()
 
 if __name__ == '__main__':
-    try:
+    if IS_DEV:
         init_db()
         app.run(debug=True)
-    except Exception as e:
-        logger.error(f"Failed to start application: {str(e)}") 
\ No newline at end of file
+    else:
+        logger.error("The dev server only runs with FLASK_ENV=development; use gunicorn (see Procfile)") 
\ No newline at end of file
@@ -41,7 +41,7 @@ function displayTodos(todos) {
         todoItem.innerHTML = `
             <div class="todo-content">
                 <span class="todo-text">${todo.title}</span>
-                <span class="todo-time"><i class="far fa-clock"></i> ${todo.created_at}</span>
+                <span class="todo-time"><i class="far fa-clock"></i> ${formatTime(todo.created_at)}</span>
             </div>
             <div class="todo-actions">
                 <button class="toggle" onclick="toggleTodo(${todo.id})">
@@ -58,6 +58,14 @@ function displayTodos(todos) {
     });
 }
 
+const timeFormat = new Intl.DateTimeFormat(undefined, { dateStyle: 'medium', timeStyle: 'short' });
+
+function formatTime(iso) {
+    // Server timestamps are UTC; treat ones without an offset as such
+    const hasOffset = /(Z|[+-]\d{2}:\d{2})$/.test(iso);
+    return timeFormat.format(new Date(hasOffset ? iso : iso + 'Z'));
+}
+
 async function addTodo() {
     const input = document.getElementById('todoInput');
     const title = input.value.trim();